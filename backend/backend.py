@@ -1,90 +1,264 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from datetime import datetime, timedelta
+from datetime import date, datetime, time, timedelta
 from typing import List, Dict, Any, Optional
 import json
+import logging
 import re
+import bisect
+import functools
+import itertools
+import math
+import os
 from langchain_core.messages import HumanMessage, AIMessage
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
-from typing_extensions import TypedDict
 import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+
+logging.basicConfig(level=logging.INFO)
+log = logging.getLogger(__name__)
+
+
+# Calendar times are naive local datetimes; they are mapped to seconds on a
+# naive epoch so hour-of-day and weekday fall out of integer arithmetic.
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_WEEKDAY = _EPOCH.weekday()  # Thursday
+
+
+def _to_ts(dt: datetime) -> float:
+    return (dt - _EPOCH).total_seconds()
+
+
+def _from_ts(ts: float) -> datetime:
+    return _EPOCH + timedelta(seconds=ts)
+
+
+_WEEKDAY_NAMES = (
+    "Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday",
+)
+_MONTH_NAMES = (
+    "January", "February", "March", "April", "May", "June",
+    "July", "August", "September", "October", "November", "December",
+)
+
+
+def _format_slot(dt: datetime) -> str:
+    """Same output as dt.strftime("%A, %B %d at %I:%M %p") without locale lookups"""
+    hour12 = (dt.hour - 1) % 12 + 1
+    ampm = "AM" if dt.hour < 12 else "PM"
+    return (
+        f"{_WEEKDAY_NAMES[dt.weekday()]}, {_MONTH_NAMES[dt.month - 1]} {dt.day:02d}"
+        f" at {hour12:02d}:{dt.minute:02d} {ampm}"
+    )
+
+
+def _find_free_slots(
+    start_ts: float,
+    end_ts: float,
+    busy_starts: List[float],
+    busy_ends: List[float],
+    max_slots: int,
+) -> List[float]:
+    """Start times of free one-hour business slots in [start_ts, end_ts).
+
+    Works on plain floats only; busy intervals must be sorted by start.
+    """
+    free = []
+    n_busy = len(busy_starts)
+    i = 0
+    # Candidates keep the minute offset of start_ts; only business hours
+    # (9 AM to 5 PM) on Monday to Friday are generated
+    offset = start_ts % 3600
+
+    for day in range(int(start_ts // 86400), int(end_ts // 86400) + 1):
+        if (day + _EPOCH_WEEKDAY) % 7 >= 5:
+            continue
+        for hour in range(9, 17):
+            slot_start_ts = day * 86400 + hour * 3600 + offset
+            if slot_start_ts < start_ts:
+                continue
+            if slot_start_ts >= end_ts:
+                return free
+
+            # Skip busy intervals that end before this slot; the next one
+            # (sorted by start) is the only candidate for a conflict
+            while i < n_busy and busy_ends[i] <= slot_start_ts:
+                i += 1
+            if i < n_busy and busy_starts[i] < slot_start_ts + 3600:
+                continue
+
+            free.append(slot_start_ts)
+            if len(free) == max_slots:
+                return free
+
+    return free
+
+
+def _format_iso(dt: datetime) -> str:
+    """Same output as dt.isoformat() for the naive datetimes the calendar uses"""
+    iso = (
+        f"{dt.year:04d}-{dt.month:02d}-{dt.day:02d}"
+        f"T{dt.hour:02d}:{dt.minute:02d}:{dt.second:02d}"
+    )
+    if dt.microsecond:
+        iso += f".{dt.microsecond:06d}"
+    return iso
+
+
+def _make_slot(current: datetime) -> Dict:
+    """A JSON-ready slot, shared as-is between state, cache and API response"""
+    return {
+        "start": _format_iso(current),
+        "end": _format_iso(current + timedelta(hours=1)),
+        "formatted": _format_slot(current),
+    }
 
 
 class MockCalendar:
     def __init__(self):
-        self.appointments = [
-            {
-                "id": "1",
-                "title": "Team Meeting",
-                "start": datetime.now() + timedelta(days=1, hours=2),
-                "end": datetime.now() + timedelta(days=1, hours=3),
-            },
-            {
-                "id": "2",
-                "title": "Client Call",
-                "start": datetime.now() + timedelta(days=2, hours=4),
-                "end": datetime.now() + timedelta(days=2, hours=5),
-            },
-        ]
+        # Appointments are stored column-wise (struct of arrays); dicts are only
+        # built at the API boundary
+        self._ids: List[str] = []
+        self._titles: List[str] = []
+        self._starts_ts: List[float] = []
+        self._ends_ts: List[float] = []
+        # id -> index into the columns above
+        self._by_id: Dict[str, int] = {}
+        # Busy intervals sorted by start, for the availability sweep
+        self._busy_starts: List[float] = []
+        self._busy_ends: List[float] = []
+        # Running max of _busy_ends, so a single interval can be checked with one bisect
+        self._busy_reach: List[float] = []
+        # Bumped on every booking or cancellation so cached views can be keyed on it
+        self.version = 0
+        # Ids are never reused, even after cancellations
+        self._next_id = itertools.count(1)
+
+        now = datetime.now()
+        self._add(
+            str(next(self._next_id)),
+            "Team Meeting",
+            now + timedelta(days=1, hours=2),
+            now + timedelta(days=1, hours=3),
+        )
+        self._add(
+            str(next(self._next_id)),
+            "Client Call",
+            now + timedelta(days=2, hours=4),
+            now + timedelta(days=2, hours=5),
+        )
+
+    def _add(self, appointment_id: str, title: str, start: datetime, end: datetime):
+        start_ts, end_ts = _to_ts(start), _to_ts(end)
+        self._by_id[appointment_id] = len(self._ids)
+        self._ids.append(appointment_id)
+        self._titles.append(title)
+        self._starts_ts.append(start_ts)
+        self._ends_ts.append(end_ts)
+
+        pos = bisect.bisect_right(self._busy_starts, start_ts)
+        self._busy_starts.insert(pos, start_ts)
+        self._busy_ends.insert(pos, end_ts)
+        self._refresh_reach(pos)
+
+    def _refresh_reach(self, pos: int):
+        reach = self._busy_reach
+        del reach[pos:]
+        furthest = reach[-1] if reach else -math.inf
+        for end_ts in self._busy_ends[pos:]:
+            furthest = max(furthest, end_ts)
+            reach.append(furthest)
+
+    def _appointment(self, index: int) -> Dict:
+        return {
+            "id": self._ids[index],
+            "title": self._titles[index],
+            "start": _from_ts(self._starts_ts[index]),
+            "end": _from_ts(self._ends_ts[index]),
+        }
+
+    def iter_appointments(self):
+        """Yield (id, title, start_ts, end_ts) for every appointment in booking order"""
+        return zip(self._ids, self._titles, self._starts_ts, self._ends_ts)
+
+    def is_free(self, start: datetime, end: datetime) -> bool:
+        """Whether no appointment overlaps [start, end)"""
+        # Intervals starting before `end` are busy[:i]; none may reach past `start`
+        i = bisect.bisect_left(self._busy_starts, _to_ts(end))
+        return i == 0 or self._busy_reach[i - 1] <= _to_ts(start)
 
     def get_availability(self, start_date: datetime, end_date: datetime) -> List[Dict]:
         available_slots = []
-        current = start_date
-
-        while current < end_date:
-            # Only business hours (9 AM to 5 PM)
-            if 9 <= current.hour < 17 and current.weekday() < 5:  # Monday to Friday
-                slot_end = current + timedelta(hours=1)
-                conflict = False
-
-                # Check for conflicts with existing appointments
-                for apt in self.appointments:
-                    apt_start = apt["start"]
-                    apt_end = apt["end"]
-                    if current < apt_end and slot_end > apt_start:
-                        conflict = True
-                        break
-
-                if not conflict:
-                    available_slots.append(
-                        {
-                            "start": current.isoformat(),  # Convert to ISO string immediately
-                            "end": slot_end.isoformat(),   # Convert to ISO string immediately
-                            "formatted": current.strftime("%A, %B %d at %I:%M %p"),
-                            "_datetime_start": current,    # Keep datetime for internal use
-                            "_datetime_end": slot_end,     # Keep datetime for internal use
-                        }
-                    )
-            current += timedelta(hours=1)
-
-        return available_slots[:10]  # Return max 10 slots
+        for slot_start_ts in _find_free_slots(
+            _to_ts(start_date),
+            _to_ts(end_date),
+            self._busy_starts,
+            self._busy_ends,
+            10,  # Return max 10 slots
+        ):
+            available_slots.append(_make_slot(_from_ts(slot_start_ts)))
+
+        return available_slots
 
     def book_appointment(
         self, title: str, start: datetime, duration_hours: int = 1
     ) -> Dict:
-        appointment = {
-            "id": str(len(self.appointments) + 1),
-            "title": title,
-            "start": start,
-            "end": start + timedelta(hours=duration_hours),
-        }
-        self.appointments.append(appointment)
-        return appointment
+        self._add(
+            str(next(self._next_id)), title, start, start + timedelta(hours=duration_hours)
+        )
+        self.version += 1
+        return self._appointment(len(self._ids) - 1)
+
+    def cancel_appointment(self, appointment_id: str) -> Optional[Dict]:
+        index = self._by_id.pop(appointment_id, None)
+        if index is None:
+            return None
+
+        removed = self._appointment(index)
+        start_ts, end_ts = self._starts_ts[index], self._ends_ts[index]
+        # Delete the row rather than swapping the last one in, so listings keep
+        # booking order; the rows after it move up by one
+        for column in (self._ids, self._titles, self._starts_ts, self._ends_ts):
+            del column[index]
+        for shifted, moved_id in enumerate(self._ids[index:], index):
+            self._by_id[moved_id] = shifted
+
+        pos = bisect.bisect_left(self._busy_starts, start_ts)
+        while self._busy_ends[pos] != end_ts:
+            pos += 1
+        del self._busy_starts[pos]
+        del self._busy_ends[pos]
+        self._refresh_reach(pos)
+        self.version += 1
+        return removed
 
 
 calendar = MockCalendar()
 
 
-class ConversationState(TypedDict):
-    messages: List[Any]
-    user_intent: str
-    extracted_info: Dict[str, Any]
-    available_slots: List[Dict]
-    selected_slot: Optional[Dict]
-    booking_confirmed: bool
-    conversation_phase: str  # Added to track conversation phase
+@dataclass(slots=True, frozen=True)
+class SelectedSlot:
+    """The slot a user picked, holding just what confirmation needs"""
+    formatted: str
+    start_dt: datetime
+    iso_start: str
+    iso_end: str
+
+
+@dataclass(slots=True)
+class ConversationState:
+    messages: List[Any] = field(default_factory=list)
+    user_intent: str = ""
+    extracted_info: Dict[str, Any] = field(default_factory=dict)
+    available_slots: List[Dict] = field(default_factory=list)
+    selected_slot: Optional[SelectedSlot] = None
+    booking_confirmed: bool = False
+    conversation_phase: str = "initial"  # Added to track conversation phase
+    now: Optional[datetime] = None  # Captured once per request so all date math agrees
 
 
 class ChatMessage(BaseModel):
@@ -99,281 +273,319 @@ class ChatResponse(BaseModel):
     conversation_id: str
 
 
-def extract_date_time_info(text: str) -> Dict[str, Any]:
-    """Extract date and time information from text"""
+class Appointment(BaseModel):
+    id: str
+    title: str
+    start: datetime
+    end: datetime
+
+
+class AppointmentsResponse(BaseModel):
+    appointments: List[Appointment]
+
+
+# Each category keeps the original lookup order: when a message names several
+# (e.g. "monday ... tomorrow"), the word earlier in the tuple wins, not the one
+# earlier in the text
+_DATE_WORDS = (
+    "tomorrow", "next week", "monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday",
+)
+_DAY_PARTS = ("morning", "afternoon", "evening")
+_PURPOSE_WORDS = ("meeting", "consultation", "call", "interview", "demo", "appointment")
+
+_DATE_RE = re.compile(rf"\b({'|'.join(_DATE_WORDS)})")
+# Specific times ("2 pm", "10:30 am") take precedence over day parts
+_CLOCK_TIME_RE = re.compile(r"\d{1,2}(?::\d{2})?\s*(?:am|pm)")
+_DAY_PART_RE = re.compile(rf"({'|'.join(_DAY_PARTS)})")
+_SPECIFIC_TIME_RE = re.compile(r"(\d{1,2})(?::(\d{2}))?\s*(am|pm)")
+# A whole reply that picks a slot: "3", "slot 3", "#3"
+_SLOT_RE = re.compile(r"(?:slot\s*)?#?\s*(10|[1-9])")
+_PURPOSE_RE = re.compile(rf"\b({'|'.join(_PURPOSE_WORDS)})")
+
+# Intent keywords in priority order. Each intent is a named group inside a
+# lookahead so a single scan reports every keyword position, even where
+# keywords overlap ("show me" / "meetings").
+_INTENT_KEYWORDS = {
+    "confirm_booking": ("confirm", "yes", "sounds good", "that works", "book it", "ok"),
+    "book_appointment": ("book", "schedule", "appointment", "meeting"),
+    "check_availability": ("available", "free", "slots", "times", "check availability", "show me"),
+    "modify_booking": ("cancel", "change", "reschedule"),
+}
+_INTENT_PRIORITY = {intent: rank for rank, intent in enumerate(_INTENT_KEYWORDS)}
+
+# Keyword intents each conversation phase allows; confirmation words only
+# count while a selected slot awaits confirmation
+_DEFAULT_PHASE_INTENTS = ("book_appointment", "check_availability", "modify_booking")
+_PHASE_INTENTS = {
+    "awaiting_confirmation": ("confirm_booking",) + _DEFAULT_PHASE_INTENTS,
+}
+
+
+def _compile_intent_re(intents) -> "re.Pattern[str]":
+    groups = "|".join(
+        f"(?P<{intent}>{'|'.join(map(re.escape, _INTENT_KEYWORDS[intent]))})"
+        for intent in intents
+    )
+    return re.compile(rf"\b(?={groups})")
+
+
+_DEFAULT_INTENT_RE = _compile_intent_re(_DEFAULT_PHASE_INTENTS)
+_INTENT_RE_BY_PHASE = {
+    phase: _compile_intent_re(intents) for phase, intents in _PHASE_INTENTS.items()
+}
+
+
+def _first_by_priority(pattern: "re.Pattern[str]", text_lower: str, order) -> Optional[str]:
+    """The word of order that comes first in order among pattern's matches in text"""
+    found = {match.group(1) for match in pattern.finditer(text_lower)}
+    return next((word for word in order if word in found), None)
+
+
+def extract_date_time_info(text_lower: str) -> Dict[str, Any]:
+    """Extract date and time information from already-lowercased text"""
     info = {}
-    text_lower = text.lower()
-
-    # Date patterns
-    date_patterns = {
-        r"tomorrow": "tomorrow",
-        r"next week": "next_week",
-        r"monday": "monday",
-        r"tuesday": "tuesday",
-        r"wednesday": "wednesday",
-        r"thursday": "thursday",
-        r"friday": "friday",
-        r"saturday": "saturday",
-        r"sunday": "sunday",
-    }
 
-    for pattern, value in date_patterns.items():
-        if re.search(pattern, text_lower):
-            info["date_preference"] = value
-            break
-
-    # Time patterns
-    time_patterns = [
-        (r"(\d{1,2})\s*(am|pm)", "specific_time"),
-        (r"(\d{1,2}):(\d{2})\s*(am|pm)", "specific_time"),
-        (r"morning", "morning"),
-        (r"afternoon", "afternoon"),
-        (r"evening", "evening"),
-    ]
+    date_preference = _first_by_priority(_DATE_RE, text_lower, _DATE_WORDS)
+    if date_preference:
+        info["date_preference"] = date_preference.replace(" ", "_")
 
-    for pattern, time_type in time_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            info["time_preference"] = (
-                match.group() if time_type == "specific_time" else time_type
-            )
-            break
-
-    # Purpose keywords
-    purpose_keywords = [
-        "meeting",
-        "consultation",
-        "call",
-        "interview",
-        "demo",
-        "appointment",
-    ]
-    for keyword in purpose_keywords:
-        if keyword in text_lower:
-            info["purpose"] = keyword
-            break
+    # Specific times keep the matched text, day parts ("morning") are stored as-is
+    match = _CLOCK_TIME_RE.search(text_lower)
+    time_preference = match.group() if match else _first_by_priority(_DAY_PART_RE, text_lower, _DAY_PARTS)
+    if time_preference:
+        info["time_preference"] = time_preference
+
+    purpose = _first_by_priority(_PURPOSE_RE, text_lower, _PURPOSE_WORDS)
+    if purpose:
+        info["purpose"] = purpose
 
     return info
 
 
-def determine_intent(text: str, conversation_phase: str = "") -> str:
-    """Determine user intent from text with context"""
-    text_lower = text.lower().strip()
+def determine_intent(text_lower: str, conversation_phase: str = "") -> str:
+    """Determine user intent from lowercased, stripped text with context"""
 
-    print(f"DEBUG: Determining intent for: '{text_lower}', phase: '{conversation_phase}'")
+    log.debug("Determining intent for: '%s', phase: '%s'", text_lower, conversation_phase)
 
     # Check for slot selection (numbers) - only if we're in slot selection phase
-    if conversation_phase == "awaiting_slot_selection" and text_lower in ["1", "2", "3", "4", "5", "6", "7", "8", "9", "10"]:
+    if conversation_phase == "awaiting_slot_selection" and _SLOT_RE.fullmatch(text_lower):
         return "select_slot"
 
-    # Check for confirmation - prioritize if we have a selected slot
-    if conversation_phase == "awaiting_confirmation" and any(
-        word in text_lower
-        for word in ["confirm", "yes", "sounds good", "that works", "book it", "ok"]
-    ):
-        return "confirm_booking"
-
-    # Check for booking request
-    if any(
-        word in text_lower for word in ["book", "schedule", "appointment", "meeting"]
-    ):
-        return "book_appointment"
+    intent_re = _INTENT_RE_BY_PHASE.get(conversation_phase, _DEFAULT_INTENT_RE)
+    best = None
+    for match in intent_re.finditer(text_lower):
+        if best is None or _INTENT_PRIORITY[match.lastgroup] < _INTENT_PRIORITY[best]:
+            best = match.lastgroup
 
-    # Check for availability
-    if any(
-        word in text_lower
-        for word in ["available", "free", "slots", "times", "check availability", "show me"]
-    ):
-        return "check_availability"
+    return best or "general_inquiry"
 
-    # Check for cancellation/modification
-    if any(word in text_lower for word in ["cancel", "change", "reschedule"]):
-        return "modify_booking"
 
-    return "general_inquiry"
+_WEEKDAY_IDX = {name.lower(): index for index, name in enumerate(_WEEKDAY_NAMES)}
+_BUSINESS_START = dict(hour=9, minute=0, second=0, microsecond=0)
 
 
-def get_date_range_from_preference(preference: str) -> tuple:
+def get_date_range_from_preference(
+    preference: str, now: Optional[datetime] = None
+) -> tuple:
     """Get date range based on user preference"""
-    now = datetime.now()
+    if now is None:
+        now = datetime.now()
 
     if preference == "tomorrow":
-        start = (now + timedelta(days=1)).replace(
-            hour=9, minute=0, second=0, microsecond=0
-        )
+        start = (now + timedelta(days=1)).replace(**_BUSINESS_START)
         end = start.replace(hour=17)
     elif preference == "next_week":
         days_ahead = 7 - now.weekday()
-        start = (now + timedelta(days=days_ahead)).replace(
-            hour=9, minute=0, second=0, microsecond=0
-        )
+        start = (now + timedelta(days=days_ahead)).replace(**_BUSINESS_START)
         end = start + timedelta(days=4, hours=8)  # Mon-Fri
-    elif preference in [
-        "monday",
-        "tuesday",
-        "wednesday",
-        "thursday",
-        "friday",
-        "saturday",
-        "sunday",
-    ]:
-        weekdays = [
-            "monday",
-            "tuesday",
-            "wednesday",
-            "thursday",
-            "friday",
-            "saturday",
-            "sunday",
-        ]
-        target_weekday = weekdays.index(preference)
-        days_ahead = target_weekday - now.weekday()
+    elif preference in _WEEKDAY_IDX:
+        days_ahead = _WEEKDAY_IDX[preference] - now.weekday()
         if days_ahead <= 0:  # Target day already happened this week
             days_ahead += 7
-        start = (now + timedelta(days=days_ahead)).replace(
-            hour=9, minute=0, second=0, microsecond=0
-        )
+        start = (now + timedelta(days=days_ahead)).replace(**_BUSINESS_START)
         end = start.replace(hour=17)
     else:
         # Default: next business day
-        start = (now + timedelta(days=1)).replace(
-            hour=9, minute=0, second=0, microsecond=0
-        )
+        start = (now + timedelta(days=1)).replace(**_BUSINESS_START)
         end = start + timedelta(days=2, hours=8)
 
     return start, end
 
 
-def analyze_input(state: ConversationState) -> ConversationState:
+@functools.lru_cache(maxsize=256)
+def _slots_for(preference: str, today: date, calendar_version: int) -> List[Dict]:
+    """Available slots for a date preference. The ranges only depend on the
+    current date, and the calendar version changes on every booking or
+    cancellation, so stale entries are never hit."""
+    start_date, end_date = get_date_range_from_preference(
+        preference, datetime.combine(today, time())
+    )
+    return calendar.get_availability(start_date, end_date)
+
+
+def specific_time_slot(preference: str, time_preference: str, today: date) -> List[Dict]:
+    """The single requested slot if the preference names one free business hour"""
+    match = _SPECIFIC_TIME_RE.fullmatch(time_preference)
+    if not match:
+        return []
+    hour, minute = int(match.group(1)), int(match.group(2) or 0)
+    if not 1 <= hour <= 12 or minute >= 60:
+        return []
+    hour = hour % 12 + (12 if match.group(3) == "pm" else 0)
+
+    start_date, end_date = get_date_range_from_preference(
+        preference, datetime.combine(today, time())
+    )
+    if end_date - start_date > timedelta(days=1):  # e.g. "next week" spans several days
+        return []
+    start = start_date.replace(hour=hour, minute=minute)
+    end = start + timedelta(hours=1)
+    if start.weekday() >= 5 or start.hour < 9 or end > start.replace(hour=17, minute=0):
+        return []
+    if not calendar.is_free(start, end):
+        return []
+    return [_make_slot(start)]
+
+
+async def analyze_input(state: ConversationState) -> ConversationState:
     """Analyze user input and extract intent and information"""
-    last_message = state["messages"][-1].content
-    conversation_phase = state.get("conversation_phase", "")
-    
-    intent = determine_intent(last_message, conversation_phase)
-    extracted_info = extract_date_time_info(last_message)
+    # Lowercased once here and shared by both helpers
+    text_lower = state.messages[-1].content.lower().strip()
+    conversation_phase = state.conversation_phase
 
-    state["user_intent"] = intent
-    state["extracted_info"] = {**state.get("extracted_info", {}), **extracted_info}
+    intent = determine_intent(text_lower, conversation_phase)
+    extracted_info = extract_date_time_info(text_lower)
 
-    print(f"DEBUG: Intent determined: {intent}, Phase: {conversation_phase}")
+    state.user_intent = intent
+    # Date and purpose carry over between turns, but a requested time only applies
+    # to the message that names it; otherwise "monday" after "tomorrow at 10 am"
+    # would only offer Monday 10:00
+    state.extracted_info.pop("time_preference", None)
+    state.extracted_info.update(extracted_info)
+
+    log.debug("Intent determined: %s, Phase: %s", intent, conversation_phase)
     
     return state
 
 
-def check_availability(state: ConversationState) -> ConversationState:
+async def check_availability(state: ConversationState) -> ConversationState:
     """Check available time slots"""
-    extracted_info = state["extracted_info"]
-
-    if "date_preference" in extracted_info:
-        start_date, end_date = get_date_range_from_preference(
-            extracted_info["date_preference"]
-        )
-    else:
-        # Default to tomorrow
-        now = datetime.now()
-        start_date = (now + timedelta(days=1)).replace(
-            hour=9, minute=0, second=0, microsecond=0
-        )
-        end_date = start_date.replace(hour=17)
-
-    available_slots = calendar.get_availability(start_date, end_date)
-    state["available_slots"] = available_slots
-    state["conversation_phase"] = "awaiting_slot_selection"  # Set phase
-
-    print(f"DEBUG: Found {len(available_slots)} available slots")
+    extracted_info = state.extracted_info
+
+    # Default to tomorrow
+    preference = extracted_info.get("date_preference", "tomorrow")
+    today = (state.now or datetime.now()).date()
+
+    # A specific time ("2 pm") only needs that one slot checked; fall back to
+    # the full day's list when it isn't bookable
+    available_slots = specific_time_slot(
+        preference, extracted_info.get("time_preference", ""), today
+    )
+    if not available_slots:
+        available_slots = list(_slots_for(preference, today, calendar.version))
+    state.available_slots = available_slots
+    state.conversation_phase = "awaiting_slot_selection"  # Set phase
+
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Found %d available slots", len(available_slots))
     
     return state
 
 
-def handle_slot_selection(state: ConversationState) -> ConversationState:
+async def handle_slot_selection(state: ConversationState) -> ConversationState:
     """Handle user's slot selection"""
-    last_message = state["messages"][-1].content.strip()
-    available_slots = state.get("available_slots", [])
+    last_message = state.messages[-1].content.strip()
+    available_slots = state.available_slots
 
-    print(f"DEBUG: Handling slot selection: '{last_message}', Available slots: {len(available_slots)}")
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Handling slot selection: '%s', Available slots: %d", last_message, len(available_slots))
 
     # Handle numeric selection
-    try:
-        slot_number = int(last_message)
-        if 1 <= slot_number <= len(available_slots):
-            selected_slot = available_slots[slot_number - 1].copy()
-            state["selected_slot"] = selected_slot
-            state["conversation_phase"] = "awaiting_confirmation"  # Update phase
-            print(f"DEBUG: Slot {slot_number} selected: {selected_slot['formatted']}")
-        else:
-            print(f"DEBUG: Invalid slot number: {slot_number}")
-    except ValueError:
-        print(f"DEBUG: Could not parse slot number from: '{last_message}'")
+    match = _SLOT_RE.fullmatch(last_message.lower())
+    slot_number = int(match.group(1)) if match else None
+    if slot_number is None:
+        log.debug("Could not parse slot number from: '%s'", last_message)
+    elif 1 <= slot_number <= len(available_slots):
+        slot = available_slots[slot_number - 1]
+        # Slots only carry ISO strings; parse once when the user picks one
+        state.selected_slot = SelectedSlot(
+            slot["formatted"], datetime.fromisoformat(slot["start"]), slot["start"], slot["end"]
+        )
+        state.conversation_phase = "awaiting_confirmation"  # Update phase
+        log.debug("Slot %d selected: %s", slot_number, slot["formatted"])
+    else:
+        log.debug("Invalid slot number: %d", slot_number)
 
     return state
 
 
-def confirm_booking(state: ConversationState) -> ConversationState:
+async def confirm_booking(state: ConversationState) -> ConversationState:
     """Confirm and create the booking"""
-    selected_slot = state.get("selected_slot")
-    extracted_info = state.get("extracted_info", {})
+    selected_slot = state.selected_slot
+    extracted_info = state.extracted_info
 
-    print(f"DEBUG: Confirming booking. Selected slot: {selected_slot}")
+    log.debug("Confirming booking. Selected slot: %s", selected_slot)
 
     if selected_slot:
         purpose = extracted_info.get("purpose", "meeting")
         title = f"Scheduled {purpose.title()}"
 
         try:
-            # Use the datetime object for booking
-            start_datetime = selected_slot.get("_datetime_start")
-            if not start_datetime:
-                # Fallback: parse from ISO string
-                start_datetime = datetime.fromisoformat(selected_slot["start"].replace("Z", "+00:00"))
+            appointment = calendar.book_appointment(title, selected_slot.start_dt)
 
-            appointment = calendar.book_appointment(title, start_datetime)
+            state.booking_confirmed = True
+            state.available_slots = []  # Reset slots after booking
+            state.selected_slot = None  # Clear selected slot
+            state.user_intent = ""  # Reset intent
+            state.conversation_phase = "booking_complete"  # Update phase
 
-            state["booking_confirmed"] = True
-            state["available_slots"] = []  # Reset slots after booking
-            state["selected_slot"] = None  # Clear selected slot
-            state["user_intent"] = ""  # Reset intent
-            state["conversation_phase"] = "booking_complete"  # Update phase
+            response = f"✅ Booking confirmed! Your {purpose} is scheduled for {selected_slot.formatted}. Appointment ID: {appointment['id']}"
+            state.messages.append(AIMessage(content=response))
 
-            response = f"✅ Booking confirmed! Your {purpose} is scheduled for {selected_slot['formatted']}. Appointment ID: {appointment['id']}"
-            state["messages"].append(AIMessage(content=response))
+            log.debug("Appointment booked successfully: %s", appointment)
 
-            print(f"DEBUG: Appointment booked successfully: {appointment}")
-
-        except Exception as e:
-            print(f"ERROR: Failed to book appointment: {str(e)}")
+        except Exception:
+            log.exception("Failed to book appointment")
             response = "❌ Sorry, there was an error booking your appointment. Please try again."
-            state["messages"].append(AIMessage(content=response))
+            state.messages.append(AIMessage(content=response))
     else:
         response = "❌ No slot selected. Please choose a slot first."
-        state["messages"].append(AIMessage(content=response))
+        state.messages.append(AIMessage(content=response))
 
     return state
 
 
-def generate_response(state: ConversationState) -> ConversationState:
+_SLOTS_HEADER = "I found some available time slots for you:\n\n"
+_SLOTS_FOOTER = "\nPlease select a slot by clicking the button or typing the number (e.g., '1' for the first slot)."
+
+
+async def generate_response(state: ConversationState) -> ConversationState:
     """Generate appropriate response based on intent and state"""
-    intent = state["user_intent"]
-    available_slots = state.get("available_slots", [])
-    extracted_info = state.get("extracted_info", {})
-    selected_slot = state.get("selected_slot")
-    conversation_phase = state.get("conversation_phase", "")
+    intent = state.user_intent
+    available_slots = state.available_slots
+    extracted_info = state.extracted_info
+    selected_slot = state.selected_slot
+    conversation_phase = state.conversation_phase
 
-    print(f"DEBUG: Generating response for intent: {intent}, phase: {conversation_phase}")
-    print(f"DEBUG: Available slots: {len(available_slots)}, Selected slot: {bool(selected_slot)}")
+    log.debug("Generating response for intent: %s, phase: %s", intent, conversation_phase)
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug("Available slots: %d, Selected slot: %s", len(available_slots), bool(selected_slot))
 
     if intent == "book_appointment" or intent == "check_availability":
         if available_slots:
-            response = "I found some available time slots for you:\n\n"
-            for i, slot in enumerate(available_slots, 1):
-                response += f"{i}. {slot['formatted']}\n"
-            response += "\nPlease select a slot by clicking the button or typing the number (e.g., '1' for the first slot)."
+            parts = [_SLOTS_HEADER]
+            parts.extend(
+                f"{i}. {slot['formatted']}\n" for i, slot in enumerate(available_slots, 1)
+            )
+            parts.append(_SLOTS_FOOTER)
+            response = "".join(parts)
             # Don't change phase here - it's already set in check_availability
         else:
             response = "Let me check availability for you. Please specify your preferred date and time."
 
     elif intent == "select_slot":
         if selected_slot:
-            response = f"Perfect! You've selected: {selected_slot['formatted']}\n\nWould you like to confirm this booking? Click 'Confirm' or reply with 'yes'."
+            response = f"Perfect! You've selected: {selected_slot.formatted}\n\nWould you like to confirm this booking? Click 'Confirm' or reply with 'yes'."
             # Phase is already set to awaiting_confirmation in handle_slot_selection
         else:
             response = "I didn't find that slot. Please choose a number from the available options above."
@@ -387,12 +599,30 @@ def generate_response(state: ConversationState) -> ConversationState:
 
     else:  # general_inquiry
         response = "Hello! I'm here to help you book appointments. You can say things like:\n- 'book meeting tomorrow'\n- 'check availability next week'\n- 'schedule call monday'"
-        state["conversation_phase"] = "initial"
+        state.conversation_phase = "initial"
 
-    state["messages"].append(AIMessage(content=response))
+    state.messages.append(AIMessage(content=response))
     return state
 
 
+# Intent -> next node after "analyze"; confirm_booking depends on having a slot
+_ROUTES = {
+    "book_appointment": "check_availability",
+    "check_availability": "check_availability",
+    "select_slot": "handle_selection",
+}
+_CONFIRM_ROUTES = {True: "confirm_booking", False: "respond"}
+
+
+def should_check_availability(state: ConversationState) -> str:
+    intent = state.user_intent
+    log.debug("Routing decision for intent: %s", intent)
+
+    if intent == "confirm_booking":
+        return _CONFIRM_ROUTES[bool(state.selected_slot)]
+    return _ROUTES.get(intent, "respond")
+
+
 def create_booking_workflow():
     """Create the booking workflow"""
     workflow = StateGraph(ConversationState)
@@ -407,23 +637,6 @@ def create_booking_workflow():
     # Set entry point
     workflow.set_entry_point("analyze")
 
-    def should_check_availability(state):
-        intent = state["user_intent"]
-        print(f"DEBUG: Routing decision for intent: {intent}")
-
-        if intent in ["book_appointment", "check_availability"]:
-            return "check_availability"
-        elif intent == "select_slot":
-            return "handle_selection"
-        elif intent == "confirm_booking":
-            # Check if we have a selected slot to confirm
-            if state.get("selected_slot"):
-                return "confirm_booking"
-            else:
-                return "respond"
-        else:
-            return "respond"
-
     # Add conditional edges
     workflow.add_conditional_edges("analyze", should_check_availability)
     workflow.add_edge("check_availability", "respond")
@@ -434,14 +647,102 @@ def create_booking_workflow():
     return workflow.compile()
 
 
-# Create the booking agent
-booking_agent = create_booking_workflow()
+async def process_message(state: ConversationState) -> ConversationState:
+    """Run one turn through the booking nodes directly, with the same routing as
+    the graph but without its scheduling overhead"""
+    await analyze_input(state)
+    route = should_check_availability(state)
+
+    if route == "check_availability":
+        await check_availability(state)
+    elif route == "handle_selection":
+        await handle_slot_selection(state)
+    elif route == "confirm_booking":
+        return await confirm_booking(state)
+
+    return await generate_response(state)
+
+
+# The LangGraph workflow is kept for future multi-step flows; set USE_LANGGRAPH=1
+# to route turns through it instead of process_message
+USE_LANGGRAPH = os.getenv("USE_LANGGRAPH") == "1"
+booking_agent = create_booking_workflow() if USE_LANGGRAPH else None
 
-# Store conversations
-conversations: Dict[str, ConversationState] = {}
+
+async def run_booking_turn(state: ConversationState) -> ConversationState:
+    if booking_agent is None:
+        return await process_message(state)
+    # The graph hands back its channels as a plain dict
+    return ConversationState(**await booking_agent.ainvoke(state))
+
+
+# Store conversations, least recently used first, capped so a long-running
+# server does not grow without bound
+MAX_CONVERSATIONS = int(os.getenv("MAX_CONVERSATIONS", "10000"))
+# Nodes only read the latest message, so older history is trimmed per turn
+MAX_MESSAGES = int(os.getenv("MAX_MESSAGES", "50"))
+# Zero would evict a conversation as soon as it is stored, and the history trim
+# (del messages[:-MAX_MESSAGES]) keeps everything for 0 and the wrong slice below it
+for _name, _limit in (("MAX_CONVERSATIONS", MAX_CONVERSATIONS), ("MAX_MESSAGES", MAX_MESSAGES)):
+    if _limit < 1:
+        raise ValueError(f"{_name} must be at least 1, got {_limit}")
+conversations: "OrderedDict[str, ConversationState]" = OrderedDict()
+
+
+@dataclass(slots=True)
+class _ConversationLock:
+    lock: asyncio.Lock = field(default_factory=asyncio.Lock)
+    users: int = 0  # requests holding or waiting on the lock
+
+
+# One lock per conversation so concurrent requests don't interleave state updates.
+# Entries live only while a request uses them, independent of the LRU above, so
+# evicting a conversation can never hand a new request a second lock for it
+conversation_locks: Dict[str, _ConversationLock] = {}
+
+
+@asynccontextmanager
+async def conversation_lock(conversation_id: str):
+    """Hold the conversation's lock, dropping it once no request needs it"""
+    entry = conversation_locks.setdefault(conversation_id, _ConversationLock())
+    entry.users += 1
+    try:
+        async with entry.lock:
+            yield
+    finally:
+        entry.users -= 1
+        if not entry.users:
+            del conversation_locks[conversation_id]
+
+
+def get_conversation(conversation_id: str) -> ConversationState:
+    """Return the stored conversation state, or a fresh one for a new conversation"""
+    state = conversations.get(conversation_id)
+    return ConversationState() if state is None else state
+
+
+def save_conversation(conversation_id: str, state: ConversationState):
+    """Store the state as most recently used, evicting the oldest beyond the cap.
+    Saving after the turn means a conversation evicted mid-turn comes back
+    without pushing the store past MAX_CONVERSATIONS"""
+    conversations[conversation_id] = state
+    conversations.move_to_end(conversation_id)
+    while len(conversations) > MAX_CONVERSATIONS:
+        conversations.popitem(last=False)
 
 # Create FastAPI app
-app = FastAPI(title="Calendar Booking Agent API")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Warm the booking turn and Pydantic validators before serving traffic"""
+    if not os.getenv("SKIP_WARMUP"):
+        # A greeting only goes through analyze -> respond, so the calendar is untouched
+        await run_booking_turn(ConversationState(messages=[HumanMessage(content="hi")]))
+        ChatMessage(message="hi", conversation_id="_").model_dump()
+        ChatResponse(response="hi", conversation_id="_").model_dump()
+    yield
+
+
+app = FastAPI(title="Calendar Booking Agent API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -456,62 +757,42 @@ app.add_middleware(
 async def chat_endpoint(message: ChatMessage):
     """Main chat endpoint"""
     try:
-        # Initialize conversation if not exists
-        if message.conversation_id not in conversations:
-            conversations[message.conversation_id] = {
-                "messages": [],
-                "user_intent": "",
-                "extracted_info": {},
-                "available_slots": [],
-                "selected_slot": None,
-                "booking_confirmed": False,
-                "conversation_phase": "initial",
-            }
-
-        # Get current state
-        state = conversations[message.conversation_id]
+        async with conversation_lock(message.conversation_id):
+            # Get current state, initializing the conversation if it doesn't exist
+            state = get_conversation(message.conversation_id)
 
-        print(f"DEBUG: Processing message: '{message.message}' in phase: '{state.get('conversation_phase', 'unknown')}'")
+            log.debug("Processing message: '%s' in phase: '%s'", message.message, state.conversation_phase)
 
-        # Add user message to state
-        state["messages"].append(HumanMessage(content=message.message))
+            # Add user message to state
+            state.messages.append(HumanMessage(content=message.message))
+            state.now = datetime.now()
 
-        # Process through workflow
-        result = await asyncio.to_thread(booking_agent.invoke, state)
+            # Process through workflow
+            result = await run_booking_turn(state)
 
-        # Update conversation state
-        conversations[message.conversation_id] = result
+            # Update conversation state
+            del result.messages[:-MAX_MESSAGES]
+            save_conversation(message.conversation_id, result)
 
         # Get AI response
         ai_response = (
-            result["messages"][-1].content
-            if result["messages"]
+            result.messages[-1].content
+            if result.messages
             else "I'm ready to help you book an appointment!"
         )
 
-        # Prepare slots for response (ensure they're JSON serializable)
-        response_slots = []
-        for slot in result.get("available_slots", []):
-            clean_slot = {
-                "start": slot["start"],
-                "end": slot["end"],
-                "formatted": slot["formatted"]
-            }
-            response_slots.append(clean_slot)
-
-        print(f"DEBUG: Returning response with {len(response_slots)} slots, booking_confirmed: {result.get('booking_confirmed', False)}")
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("Returning response with %d slots, booking_confirmed: %s", len(result.available_slots), result.booking_confirmed)
 
         return ChatResponse(
             response=ai_response,
-            available_slots=response_slots,
-            booking_confirmed=result.get("booking_confirmed", False),
+            available_slots=result.available_slots,
+            booking_confirmed=result.booking_confirmed,
             conversation_id=message.conversation_id,
         )
 
     except Exception as e:
-        print(f"ERROR in chat endpoint: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Error in chat endpoint")
         raise HTTPException(status_code=500, detail=str(e))
 
 
@@ -521,32 +802,31 @@ async def health_check():
     return {"status": "healthy", "message": "Calendar booking API is running"}
 
 
-@app.get("/appointments")
+@functools.lru_cache(maxsize=1)
+def _serialized_appointments(calendar_version: int) -> List[Dict]:
+    """Appointment dicts, rebuilt only when the calendar version changes"""
+    return [
+        {"id": apt_id, "title": title, "start": _from_ts(start_ts), "end": _from_ts(end_ts)}
+        for apt_id, title, start_ts, end_ts in calendar.iter_appointments()
+    ]
+
+
+@app.get("/appointments", response_model=AppointmentsResponse)
 async def get_appointments():
     """Get all booked appointments"""
-    # Convert datetime objects to ISO format for JSON serialization
-    appointments_json = []
-    for apt in calendar.appointments:
-        apt_copy = apt.copy()
-        if isinstance(apt_copy["start"], datetime):
-            apt_copy["start"] = apt_copy["start"].isoformat()
-        if isinstance(apt_copy["end"], datetime):
-            apt_copy["end"] = apt_copy["end"].isoformat()
-        appointments_json.append(apt_copy)
-
-    return {"appointments": appointments_json}
+    # Pydantic writes the datetimes as ISO strings while serializing the response model
+    return {"appointments": _serialized_appointments(calendar.version)}
 
 
 @app.delete("/appointments/{appointment_id}")
 async def cancel_appointment(appointment_id: str):
     """Cancel an appointment"""
-    for i, apt in enumerate(calendar.appointments):
-        if apt["id"] == appointment_id:
-            removed = calendar.appointments.pop(i)
-            return {
-                "message": f"Appointment {appointment_id} cancelled",
-                "appointment": removed,
-            }
+    removed = calendar.cancel_appointment(appointment_id)
+    if removed:
+        return {
+            "message": f"Appointment {appointment_id} cancelled",
+            "appointment": removed,
+        }
 
     raise HTTPException(status_code=404, detail="Appointment not found")
 
@@ -557,12 +837,12 @@ async def debug_conversations():
     debug_data = {}
     for conv_id, state in conversations.items():
         debug_data[conv_id] = {
-            "phase": state.get("conversation_phase", "unknown"),
-            "intent": state.get("user_intent", ""),
-            "available_slots_count": len(state.get("available_slots", [])),
-            "has_selected_slot": bool(state.get("selected_slot")),
-            "booking_confirmed": state.get("booking_confirmed", False),
-            "message_count": len(state.get("messages", []))
+            "phase": state.conversation_phase,
+            "intent": state.user_intent,
+            "available_slots_count": len(state.available_slots),
+            "has_selected_slot": bool(state.selected_slot),
+            "booking_confirmed": state.booking_confirmed,
+            "message_count": len(state.messages)
         }
     return debug_data
 
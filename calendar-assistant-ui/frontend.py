@@ -1,8 +1,20 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
-from datetime import datetime, timedelta
+from datetime import datetime
 import uuid
+import html
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
+from itertools import islice
+
+try:
+    import orjson
+except ImportError:  # optional speedup; the stdlib json module is used without it
+    orjson = None
 
 # Page config
 st.set_page_config(
@@ -13,25 +25,20 @@ st.set_page_config(
 # API_BASE_URL = "http://0.0.0.0:8000"
 API_BASE_URL = "http://localhost:8000"
 
-# Initialize session state
-if "conversation_id" not in st.session_state:
-    st.session_state.conversation_id = str(uuid.uuid4())
-
-if "messages" not in st.session_state:
-    st.session_state.messages = []
+# Chat history kept per session, and how many of the latest messages are shown
+# outside the "full history" expander
+MAX_MESSAGES = 200
+CHAT_WINDOW = 50
 
-if "booking_confirmed" not in st.session_state:
-    st.session_state.booking_confirmed = False
-
-if "awaiting_confirmation" not in st.session_state:
-    st.session_state.awaiting_confirmation = False
+# Repeats of the same message within this many seconds are treated as one send
+SEND_DEBOUNCE_SECONDS = 0.25
 
-if "selected_slot" not in st.session_state:
-    st.session_state.selected_slot = None
+# How long a send waits for the /chat reply before handing it to a polling
+# fragment, and how often that fragment checks
+INLINE_REPLY_SECONDS = 1.0
+REPLY_POLL_SECONDS = 0.25
 
-# Custom CSS for better styling
-st.markdown(
-    """
+_CSS = """
 <style>
     .main-header {
         text-align: center;
@@ -67,131 +74,465 @@ st.markdown(
         margin-right: 20%;
     }
     
-    .booking-success {
-        background-color: #d4edda;
-        border: 1px solid #c3e6cb;
-        color: #155724;
-        padding: 1rem;
-        border-radius: 5px;
-        margin: 1rem 0;
-    }
-    
-    .quick-phrases {
-        background-color: #471396;
-        border: 1px solid #ffeaa7;
-        color: #DCD7C9;
-        padding: 1rem;
-        border-radius: 5px;
-        margin: 1rem 0;
-    }
-    
-    .slot-selection {
-        background-color: #e8f5e8;
-        border: 1px solid #4caf50;
-        color: #2e7d32;
-        padding: 1rem;
-        border-radius: 5px;
-        margin: 1rem 0;
-    }
-    
     .stButton > button {
         width: 100%;
         margin: 0.2rem 0;
     }
 </style>
-""",
-    unsafe_allow_html=True,
-)
+"""
+
+_FOOTER = """
+<div style="text-align: center; color: #666;">
+    <small>
+        🤖 Powered by FastAPI + LangGraph + Streamlit | 
+        <strong>Conversation ID:</strong> {conversation_id}
+    </small>
+</div>
+"""
+
+_SIDEBAR_HOWTO = """
+    **✅ RECOMMENDED - Use Quick Phrase Buttons:**
+    - Click the buttons instead of typing
+    - These phrases work best with the AI
+    - Covers all booking scenarios
+    
+    **🎯 Proven Working Phrases:**
+    - "book meeting tomorrow"
+    - "schedule call tomorrow" 
+    - "check availability next week"
+    - "what slots are available"
+    - Numbers: "1", "2", "3", "4" for slot selection
+    - "confirm", "yes", "sounds good"
+    
+    **⚠️ Avoid Complex Language:**
+    - Don't use: "I would like to schedule..."
+    - Use: "book meeting tomorrow"
+    - Don't use: "Can we meet on..."
+    - Use: "book meeting monday"
+    """
+
+_SIDEBAR_TIPS = """
+    **Step 1:** Click a booking button  
+    **Step 2:** Wait for available slots  
+    **Step 3:** Click slot number (1, 2, 3, 4)  
+    **Step 4:** Confirm with "yes" or "confirm"
+    
+    **Most reliable phrases:**
+    - book meeting tomorrow
+    - check availability tomorrow  
+    - 1 (for first slot)
+    - confirm
+    """
+
+
+def conversation_defaults() -> dict:
+    """Fresh per-conversation session state; conversation_id is filled in lazily"""
+    return {
+        "conversation_id": None,
+        "messages": deque(maxlen=MAX_MESSAGES),
+        "booking_confirmed": False,
+        "awaiting_confirmation": False,
+        "selected_slot": None,
+        # (message, received at, reply) of the last answered send, for repeats
+        "last_reply": None,
+    }
+
+
+# Initialize session state
+for key, value in conversation_defaults().items():
+    st.session_state.setdefault(key, value)
+if st.session_state.conversation_id is None:
+    st.session_state.conversation_id = str(uuid.uuid4())
+
+# Custom CSS for better styling. Streamlit drops any element a rerun doesn't
+# re-emit, so this is sent every run; keeping it a constant avoids rebuilding it
+st.markdown(_CSS, unsafe_allow_html=True)
+
+
+# Sent with every request by the shared session; requests already keeps connections alive
+_HEADERS = {"Content-Type": "application/json", "User-Agent": "calendar-frontend/1.0"}
+
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """Pooled HTTP session shared across reruns so calls reuse open connections"""
+    session = requests.Session()
+    # Only 502/503/504 answers are retried, and urllib3 only retries idempotent
+    # methods, so /chat POSTs are never resent. Connect errors and read timeouts are
+    # not retried: each would multiply the short health and warm-up timeouts
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=20,
+        max_retries=Retry(
+            total=2, connect=0, read=False, backoff_factor=0.2, status_forcelist=[502, 503, 504]
+        ),
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    session.headers.update(_HEADERS)
+    return session
+
+
+# Open a pooled connection once per browser session, so the user's first click
+# doesn't pay for the connect; the response itself is irrelevant
+if "_warmed" not in st.session_state:
+    try:
+        get_http_session().get(f"{API_BASE_URL}/health", timeout=1.0)
+    except requests.exceptions.RequestException:
+        pass
+    st.session_state._warmed = True
+
+
+# Messages that only look up availability; sending one again straight after it
+# was answered gets the same reply and leaves the backend conversation unchanged
+IDEMPOTENT_PREFIXES = ("what slots", "check availability", "show me", "what times")
+
+
+def latency_samples() -> deque:
+    """This session's (endpoint, seconds) log of the last 200 API calls"""
+    if "_latencies" not in st.session_state:
+        st.session_state._latencies = deque(maxlen=200)
+    return st.session_state._latencies
+
 
+def record_latency(samples: deque, endpoint: str, started: float):
+    # Takes the deque instead of reading session state so it can run on the
+    # executor thread; deque.append is thread-safe
+    samples.append((endpoint, time.perf_counter() - started))
 
-def send_message_to_api(message: str) -> dict:
-    """Send message to the FastAPI backend"""
+
+def latency_percentile_ms(endpoint: str, pct: float):
+    """Nearest-rank percentile of the recorded calls to endpoint, or None"""
+    samples = sorted(
+        # Snapshot first, a worker thread may be appending
+        seconds for name, seconds in list(st.session_state.get("_latencies", ())) if name == endpoint
+    )
+    if not samples:
+        return None
+    return samples[round(pct / 100 * (len(samples) - 1))] * 1000
+
+
+def dump_json(payload) -> bytes:
+    return orjson.dumps(payload) if orjson else json.dumps(payload).encode()
+
+
+def load_json(content: bytes):
+    # Both parsers raise a ValueError subclass on bad input, which callers treat
+    # like the RequestException that response.json() used to raise
+    return orjson.loads(content) if orjson else json.loads(content)
+
+
+def post_chat(session: requests.Session, conversation_id: str, message: str, samples: deque) -> dict:
+    """Runs on the executor thread, so the session and latency log are passed in
+    rather than looked up through Streamlit"""
+    started = time.perf_counter()
     try:
-        response = requests.post(
+        response = session.post(
             f"{API_BASE_URL}/chat",
-            json={
-                "message": message,
-                "conversation_id": st.session_state.conversation_id,
-            },
-            headers={"Content-Type": "application/json"},
+            # The session already sends the JSON Content-Type header
+            data=dump_json({"message": message, "conversation_id": conversation_id}),
             timeout=30,
         )
         response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
-        st.error(f"Error communicating with the booking agent: {str(e)}")
+        return load_json(response.content)
+    finally:
+        record_latency(samples, "/chat", started)
+
+
+# Seconds an immediate repeat may reuse the previous reply
+CHAT_CACHE_TTL = 30
+
+
+def repeated_reply(message: str):
+    """The previous reply if message repeats the message it answered, else None.
+    Only an immediate repeat qualifies: an equal reply to some earlier turn says
+    nothing about the slots the backend holds now"""
+    last_reply = st.session_state.last_reply
+    if last_reply is None or not message.lower().startswith(IDEMPOTENT_PREFIXES):
+        return None
+    last_message, received_at, api_response = last_reply
+    if message != last_message or time.monotonic() - received_at > CHAT_CACHE_TTL:
         return None
+    return api_response
+
+
+@st.cache_resource
+def get_executor() -> ThreadPoolExecutor:
+    """Worker threads for /chat calls, shared by all sessions of the app"""
+    return ThreadPoolExecutor(max_workers=4)
+
+
+def send_message_to_api(message: str) -> Future:
+    """Start sending message to the FastAPI backend on a worker thread"""
+    return get_executor().submit(
+        post_chat, get_http_session(), st.session_state.conversation_id, message, latency_samples()
+    )
+
+
+@st.cache_data(ttl=15, show_spinner=False)
+def fetch_appointments():
+    """Fetch appointments, cached briefly so reruns don't refetch; errors are not cached"""
+    started = time.perf_counter()
+    try:
+        response = get_http_session().get(f"{API_BASE_URL}/appointments", timeout=10)
+        response.raise_for_status()
+        data = load_json(response.content)
+    finally:
+        record_latency(latency_samples(), "/appointments", started)
+
+    # Format the display times here so they are cached with the payload and
+    # reruns of the panel only look them up
+    for apt in data.get("appointments", ()):
+        apt["_start_fmt"] = format_time(apt.get("start"))
+        apt["_end_fmt"] = format_time(apt.get("end"))
+    return data
 
 
 def get_appointments():
     """Get all appointments from the API"""
     try:
-        response = requests.get(f"{API_BASE_URL}/appointments", timeout=10)
-        response.raise_for_status()
-        return response.json()
-    except requests.exceptions.RequestException as e:
+        return fetch_appointments()
+    except (requests.exceptions.RequestException, ValueError) as e:
         st.error(f"Error fetching appointments: {str(e)}")
         return None
 
 
+@st.cache_data(ttl=30, show_spinner=False)
+def check_api_health() -> str:
+    """Probe the API health endpoint and return 'ok', 'error' or 'offline'"""
+    try:
+        # Short (connect, read) timeouts so an offline API doesn't stall the sidebar
+        health_response = get_http_session().get(f"{API_BASE_URL}/health", timeout=(1.0, 2.0))
+    except Exception:
+        return "offline"
+    return "ok" if health_response.status_code == 200 else "error"
+
+
+def add_message(role: str, content: str):
+    """Append a chat message along with its HTML-escaped form, so typed text can't
+    inject markup and rendering doesn't escape the whole history on every rerun"""
+    st.session_state.messages.append(
+        {"role": role, "content": content, "_html": html.escape(content)}
+    )
+
+
 def send_predefined_message(message: str):
     """Send a predefined message and handle the response"""
+    # Drop an identical message sent again within the debounce window (double clicks)
+    now = time.monotonic()
+    last_message, last_sent = st.session_state.get("_last_send", (None, 0.0))
+    if message == last_message and now - last_sent < SEND_DEBOUNCE_SECONDS:
+        return
+    st.session_state._last_send = (message, now)
+
     # Add user message to chat
-    st.session_state.messages.append({"role": "user", "content": message})
+    add_message("user", message)
+
+    api_response = repeated_reply(message)
+    if api_response is None:
+        # Whatever happens to this send, the backend may no longer match the last reply
+        st.session_state.last_reply = None
+        future = send_message_to_api(message)
+        try:
+            # Replies normally come back well within this, so the turn still finishes
+            # in the same run; a slower one is left to reply_poller
+            with st.spinner("🤔 Processing your request..."):
+                api_response = future.result(timeout=INLINE_REPLY_SECONDS)
+        except FutureTimeout:
+            st.session_state.pending_reply = (st.session_state.conversation_id, message, future)
+            return
+        except (requests.exceptions.RequestException, ValueError) as e:
+            st.error(f"Error communicating with the booking agent: {str(e)}")
+            return
+        st.session_state.last_reply = (message, time.monotonic(), api_response)
+    handle_api_response(api_response)
+
+
+def handle_api_response(api_response: dict):
+    """Apply a /chat reply to the session"""
+    # Add assistant response to chat
+    add_message("assistant", api_response["response"])
+
+    # Handle available slots response
+    if api_response.get("available_slots"):
+        st.session_state.awaiting_confirmation = True
+        st.session_state.selected_slot = api_response["available_slots"]
+        st.success("✅ Available slots found! Please select one below.")
+
+    # Handle booking confirmation
+    if api_response.get("booking_confirmed"):
+        st.session_state.booking_confirmed = True
+        st.session_state.awaiting_confirmation = False
+        st.session_state.selected_slot = None
+        # The new booking must show up in the appointments panel right away
+        fetch_appointments.clear()
+        st.balloons()
 
-    with st.spinner("🤔 Processing your request..."):
-        api_response = send_message_to_api(message)
+        # The appointments panel is a separate fragment, so only a booking
+        # needs the whole page to rerun
+        st.rerun()
 
-    if api_response:
-        # Add assistant response to chat
-        st.session_state.messages.append(
-            {"role": "assistant", "content": api_response["response"]}
-        )
 
-        # Handle available slots response
-        if api_response.get("available_slots"):
-            st.session_state.awaiting_confirmation = True
-            st.session_state.selected_slot = api_response["available_slots"]
-            st.success("✅ Available slots found! Please select one below.")
+@st.fragment(run_every=REPLY_POLL_SECONDS)
+def reply_poller():
+    """Wait for a slow /chat reply without holding up the rest of the page"""
+    conversation_id, message, future = st.session_state.pending_reply
+    if not future.done():
+        st.caption("🤔 Processing your request...")
+        return
+
+    del st.session_state.pending_reply
+    # A reply to a conversation that was reset in the meantime is dropped
+    if conversation_id == st.session_state.conversation_id:
+        try:
+            api_response = future.result()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            st.toast(f"Error communicating with the booking agent: {str(e)}", icon="❌")
+        else:
+            st.session_state.last_reply = (message, time.monotonic(), api_response)
+            handle_api_response(api_response)
+    st.rerun()
 
-        # Handle booking confirmation
-        if api_response.get("booking_confirmed"):
-            st.session_state.booking_confirmed = True
-            st.session_state.awaiting_confirmation = False
-            st.session_state.selected_slot = None
-            st.balloons()
 
-        # Force a rerun to update the UI
-        st.rerun()
+def queue_message(message: str):
+    """Button callback: leave the message for the chat panel to send when it runs"""
+    st.session_state.pending_message = message
 
 
-# Main app layout
-st.markdown(
-    '<h1 class="main-header">🤖 AI Calendar Booking Assistant</h1>',
-    unsafe_allow_html=True,
+def queue_form_message():
+    """Form callback: queue the typed message unless it is blank"""
+    if st.session_state.user_input.strip():
+        queue_message(st.session_state.user_input)
+
+
+def acknowledge_booking():
+    """Acknowledge button callback: hide the booking confirmation"""
+    st.session_state.booking_confirmed = False
+
+
+def parse_iso(value: str) -> datetime:
+    if value.endswith("Z"):
+        value = value.removesuffix("Z") + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+def format_time(time_str):
+    # Appointment times always arrive as ISO strings in the JSON payload
+    try:
+        return parse_iso(time_str).strftime("%A, %B %d, %Y at %I:%M %p")
+    except (TypeError, ValueError):
+        return str(time_str)
+
+
+@st.cache_data(show_spinner=False)
+def slot_label(start_iso: str, end_iso: str, idx: int) -> str:
+    """Button label for a slot, parsed once per (start, end, idx) across reruns"""
+    try:
+        start_time, end_time = parse_iso(start_iso), parse_iso(end_iso)
+    except ValueError:
+        return f"Slot {idx}: {start_iso} - {end_iso}"
+    return f"Slot {idx}: {start_time:%A %I:%M %p} - {end_time:%I:%M %p}"
+
+
+# Slot buttons are laid out in this many columns
+N_SLOT_COLS = 2
+
+# Quick phrase buttons as (label, widget key, message sent), grouped per column
+PHRASE_COLUMNS = (
+    (
+        "**📅 Booking Requests:**",
+        (
+            ("📝 Book a meeting tomorrow", "book_tomorrow", "book a meeting tomorrow"),
+            ("📞 Schedule a call tomorrow", "call_tomorrow", "schedule a call tomorrow"),
+            ("🤝 Book appointment tomorrow", "appointment_tomorrow", "book appointment tomorrow"),
+            ("📅 Book meeting next week", "book_next_week", "book meeting next week"),
+        ),
+    ),
+    (
+        "**🔍 Availability Checks:**",
+        (
+            ("⏰ What slots are available tomorrow", "slots_tomorrow", "what slots are available tomorrow"),
+            ("📋 Check availability next week", "availability_next_week", "check availability next week"),
+            ("🗓️ Show me free times", "show_free_times", "show me available slots"),
+            ("⌚ What times are free", "what_times_free", "what times are available"),
+        ),
+    ),
 )
 
-# Create two columns
-col1, col2 = st.columns([2, 1])
+TIME_PHRASE_COLUMNS = (
+    (
+        ("🌅 Book meeting tomorrow morning", "morning_tomorrow", "book meeting tomorrow morning"),
+        ("🌞 Book meeting tomorrow afternoon", "afternoon_tomorrow", "book meeting tomorrow afternoon"),
+    ),
+    (
+        ("🕙 Book meeting tomorrow at 10 am", "ten_am_tomorrow", "book meeting tomorrow at 10 am"),
+        ("🕐 Book meeting tomorrow at 2 pm", "two_pm_tomorrow", "book meeting tomorrow at 2 pm"),
+    ),
+    (
+        ("📅 Book meeting monday", "book_monday", "book meeting monday"),
+        ("📅 Book meeting friday", "book_friday", "book meeting friday"),
+    ),
+)
 
-with col1:
+
+CONFIRM_PHRASE_COLUMNS = (
+    (
+        ("✅ Yes, confirm booking", "confirm_yes", "yes confirm booking"),
+        ("✅ That works for me", "confirm_works", "that works"),
+    ),
+    (
+        ("✅ Sounds good", "confirm_sounds", "sounds good"),
+        ("✅ Confirm", "confirm_simple", "confirm"),
+    ),
+)
+
+
+def phrase_buttons(phrases):
+    """Render one button per (label, key, message) and send the clicked message"""
+    for label, key, message in phrases:
+        st.button(label, key=key, on_click=queue_message, args=(message,))
+
+
+# CSS class of the chat bubble for each message role
+ROLE_CLASS = {"user": "user-message", "assistant": "ai-message"}
+
+
+def render_messages(messages) -> str:
+    """All messages as one HTML string, so the history is a single markdown element"""
+    return "".join(
+        f'<div class="{ROLE_CLASS[message["role"]]}">{message["_html"]}</div>'
+        for message in messages
+    )
+
+
+@st.fragment
+def chat_panel():
+    """Chat history, slot picker, quick phrases and the input form; reruns on its own"""
     st.markdown("### 💬 Chat with the Booking Assistant")
 
-    # Display conversation history
-    if st.session_state.messages:
-        st.markdown('<div class="chat-container">', unsafe_allow_html=True)
-        for message in st.session_state.messages:
-            if message["role"] == "user":
-                st.markdown(
-                    f'<div class="user-message">{message["content"]}</div>',
-                    unsafe_allow_html=True,
-                )
-            else:
-                st.markdown(
-                    f'<div class="ai-message">{message["content"]}</div>',
-                    unsafe_allow_html=True,
-                )
-        st.markdown("</div>", unsafe_allow_html=True)
+    # Buttons only queue their message, so it is sent here before anything that
+    # depends on the conversation is drawn and the new turn shows in this same run
+    # Queued messages wait while a slow reply is outstanding, so turns stay in order
+    if "pending_reply" not in st.session_state:
+        pending = st.session_state.pop("pending_message", None)
+        if pending:
+            send_predefined_message(pending)
+    # Checked again after the send, so a reply that just went slow is polled
+    # starting from this run
+    if "pending_reply" in st.session_state:
+        reply_poller()
+
+    # Display conversation history, the latest CHAT_WINDOW messages up front
+    messages = st.session_state.messages
+    if messages:
+        older = max(len(messages) - CHAT_WINDOW, 0)
+        if older:
+            with st.expander(f"Show full history ({older} earlier messages)"):
+                st.markdown(render_messages(islice(messages, older)), unsafe_allow_html=True)
+        st.markdown(
+            f'<div class="chat-container">{render_messages(islice(messages, older, None))}</div>',
+            unsafe_allow_html=True,
+        )
     else:
         st.info(
             "👋 Welcome! I'm your AI booking assistant. Use the quick phrases below to get started!"
@@ -199,267 +540,150 @@ with col1:
 
     # Show booking confirmation
     if st.session_state.booking_confirmed:
-        st.markdown(
-            """
-        <div class="booking-success">
-            <h4>✅ Booking Confirmed!</h4>
-            <p>Your appointment has been successfully booked. Check the appointments panel for details.</p>
-        </div>
-        """,
-            unsafe_allow_html=True,
-        )
-        # Reset the booking confirmed flag after displaying
-        if st.button("✅ Acknowledge", key="acknowledge_booking"):
-            st.session_state.booking_confirmed = False
-            st.rerun()
+        with st.container(border=True):
+            st.success("✅ Booking Confirmed!")
+            st.write(
+                "Your appointment has been successfully booked. Check the appointments panel for details."
+            )
+        # The callback clears the flag before the click's rerun, so the notice
+        # is already gone in that run
+        st.button("✅ Acknowledge", key="acknowledge_booking", on_click=acknowledge_booking)
 
     # MOVED OUTSIDE: Slot selection section (this was the main issue!)
     if st.session_state.awaiting_confirmation and st.session_state.selected_slot:
-        st.markdown(
-            """
-        <div class="slot-selection">
-            <h4>🎯 Available Time Slots - Select One:</h4>
-        </div>
-        """,
-            unsafe_allow_html=True,
-        )
+        with st.container(border=True):
+            st.subheader("🎯 Available Time Slots - Select One:")
 
         # Create slot buttons
-        slot_cols = st.columns(min(len(st.session_state.selected_slot), 2))
-        for i, slot in enumerate(st.session_state.selected_slot):
-            col_idx = i % 2
-            with slot_cols[col_idx]:
-                try:
-                    start_time = datetime.fromisoformat(
-                        slot["start"].replace("Z", "+00:00")
-                    )
-                    end_time = datetime.fromisoformat(
-                        slot["end"].replace("Z", "+00:00")
-                    )
-                    label = f"Slot {i+1}: {start_time.strftime('%A %I:%M %p')} - {end_time.strftime('%I:%M %p')}"
-                except:
-                    label = f"Slot {i+1}: {slot['start']} - {slot['end']}"
-
-                if st.button(f"📅 {label}", key=f"slot_{i}"):
-                    send_predefined_message(str(i + 1))
+        slots = st.session_state.selected_slot
+        slot_cols = st.columns(min(len(slots), N_SLOT_COLS))
+        for i, slot in enumerate(slots):
+            with slot_cols[i % N_SLOT_COLS]:
+                label = slot_label(slot["start"], slot["end"], i + 1)
+                st.button(
+                    f"📅 {label}", key=f"slot_{i}", on_click=queue_message, args=(str(i + 1),)
+                )
 
         # Quick confirmation buttons
         st.markdown("**Or use these confirmation phrases:**")
-        confirm_col1, confirm_col2 = st.columns(2)
-
-        with confirm_col1:
-            if st.button("✅ Yes, confirm booking", key="confirm_yes"):
-                send_predefined_message("yes confirm booking")
-
-            if st.button("✅ That works for me", key="confirm_works"):
-                send_predefined_message("that works")
-
-        with confirm_col2:
-            if st.button("✅ Sounds good", key="confirm_sounds"):
-                send_predefined_message("sounds good")
-
-            if st.button("✅ Confirm", key="confirm_simple"):
-                send_predefined_message("confirm")
+        for col, phrases in zip(st.columns(len(CONFIRM_PHRASE_COLUMNS)), CONFIRM_PHRASE_COLUMNS):
+            with col:
+                phrase_buttons(phrases)
 
     # Only show quick phrases when NOT awaiting confirmation
     if not st.session_state.awaiting_confirmation:
         # Quick Phrases Section
-        st.markdown(
-            """
-        <div class="quick-phrases">
-            <h4>🎯 Quick Phrases - Click the buttons below instead of typing:</h4>
-            <p>These phrases work best with the booking system!</p>
-        </div>
-        """,
-            unsafe_allow_html=True,
-        )
+        with st.container(border=True):
+            st.subheader("🎯 Quick Phrases - Click the buttons below instead of typing:")
+            st.caption("These phrases work best with the booking system!")
 
         # Quick phrase buttons in columns
-        phrase_col1, phrase_col2 = st.columns(2)
-
-        with phrase_col1:
-            st.markdown("**📅 Booking Requests:**")
-            if st.button("📝 Book a meeting tomorrow", key="book_tomorrow"):
-                send_predefined_message("book a meeting tomorrow")
-
-            if st.button("📞 Schedule a call tomorrow", key="call_tomorrow"):
-                send_predefined_message("schedule a call tomorrow")
-
-            if st.button("🤝 Book appointment tomorrow", key="appointment_tomorrow"):
-                send_predefined_message("book appointment tomorrow")
-
-            if st.button("📅 Book meeting next week", key="book_next_week"):
-                send_predefined_message("book meeting next week")
-
-        with phrase_col2:
-            st.markdown("**🔍 Availability Checks:**")
-            if st.button("⏰ What slots are available tomorrow", key="slots_tomorrow"):
-                send_predefined_message("what slots are available tomorrow")
-
-            if st.button(
-                "📋 Check availability next week", key="availability_next_week"
-            ):
-                send_predefined_message("check availability next week")
-
-            if st.button("🗓️ Show me free times", key="show_free_times"):
-                send_predefined_message("show me available slots")
-
-            if st.button("⌚ What times are free", key="what_times_free"):
-                send_predefined_message("what times are available")
+        for col, (heading, phrases) in zip(st.columns(len(PHRASE_COLUMNS)), PHRASE_COLUMNS):
+            with col:
+                st.markdown(heading)
+                phrase_buttons(phrases)
 
         # Time-specific booking buttons
         st.markdown("**🕐 Specific Time Requests:**")
-        time_col1, time_col2, time_col3 = st.columns(3)
-
-        with time_col1:
-            if st.button("🌅 Book meeting tomorrow morning", key="morning_tomorrow"):
-                send_predefined_message("book meeting tomorrow morning")
-
-            if st.button(
-                "🌞 Book meeting tomorrow afternoon", key="afternoon_tomorrow"
-            ):
-                send_predefined_message("book meeting tomorrow afternoon")
-
-        with time_col2:
-            if st.button("🕙 Book meeting tomorrow at 10 am", key="ten_am_tomorrow"):
-                send_predefined_message("book meeting tomorrow at 10 am")
-
-            if st.button("🕐 Book meeting tomorrow at 2 pm", key="two_pm_tomorrow"):
-                send_predefined_message("book meeting tomorrow at 2 pm")
-
-        with time_col3:
-            if st.button("📅 Book meeting monday", key="book_monday"):
-                send_predefined_message("book meeting monday")
-
-            if st.button("📅 Book meeting friday", key="book_friday"):
-                send_predefined_message("book meeting friday")
+        for col, phrases in zip(st.columns(len(TIME_PHRASE_COLUMNS)), TIME_PHRASE_COLUMNS):
+            with col:
+                phrase_buttons(phrases)
 
     # Manual input (kept as backup)
     st.markdown("---")
     st.markdown("**💬 Or type manually (use phrases similar to buttons above):**")
 
     with st.form("chat_form", clear_on_submit=True):
-        user_input = st.text_input(
+        st.text_input(
             "Type your message here...",
             placeholder="e.g., book meeting tomorrow or check availability next week",
             key="user_input",
         )
-        send_button = st.form_submit_button("Send 📤")
+        st.form_submit_button("Send 📤", on_click=queue_form_message)
 
-        if send_button and user_input.strip():
-            send_predefined_message(user_input)
+    # Latency of calls that actually reached the API (repeats answered locally are
+    # not timed). Drawn here rather than in the sidebar so it updates with each send,
+    # which only reruns this fragment
+    p50 = latency_percentile_ms("/chat", 50)
+    if p50 is not None:
+        p50_col, p95_col = st.columns(2)
+        p50_col.metric("p50 /chat ms", f"{p50:.0f}")
+        p95_col.metric("p95 /chat ms", f"{latency_percentile_ms('/chat', 95):.0f}")
 
-with col2:
+
+@st.fragment(run_every=15)
+def appointments_panel():
+    """Appointments list; refreshes itself without rerunning the rest of the page"""
     st.markdown("### 📅 Current Appointments")
 
     # Refresh button
     if st.button("🔄 Refresh Appointments", key="refresh_appointments"):
-        st.rerun()
+        fetch_appointments.clear()
 
     # Display appointments
     appointments_data = get_appointments()
-    if appointments_data and appointments_data.get("appointments"):
-        appointments = appointments_data["appointments"]
+    appointments = appointments_data.get("appointments") if appointments_data else None
+
+    if appointments:
+        for apt in appointments:
+            st.markdown("---")
+            st.markdown(f"### 📋 {apt.get('title', 'Untitled')}")
+            st.markdown(f"**Start:** {apt['_start_fmt']}")
+            st.markdown(f"**End:** {apt['_end_fmt']}")
+            st.markdown(f"**ID:** `{apt.get('id', 'N/A')}`")
+    else:
+        st.info("No appointments scheduled yet.")
 
 
-def format_time(time_str_or_obj):
-    try:
-        if isinstance(time_str_or_obj, str):
-            dt = datetime.fromisoformat(time_str_or_obj.replace("Z", "+00:00"))
-        else:
-            dt = time_str_or_obj
-        return dt.strftime("%A, %B %d, %Y at %I:%M %p")
-    except Exception:
-        return str(time_str_or_obj)
+# Main app layout
+st.markdown(
+    '<h1 class="main-header">🤖 AI Calendar Booking Assistant</h1>',
+    unsafe_allow_html=True,
+)
+
+# Create two columns
+col1, col2 = st.columns([2, 1])
 
+with col1:
+    chat_panel()
 
-if appointments:
-    for i, apt in enumerate(appointments):
-        st.markdown("---")
-        st.markdown(f"### 📋 {apt.get('title', 'Untitled')}")
-        st.markdown(f"**Start:** {format_time(apt.get('start'))}")
-        st.markdown(f"**End:** {format_time(apt.get('end'))}")
-        st.markdown(f"**ID:** `{apt.get('id', 'N/A')}`")
-else:
-    st.info("No appointments scheduled yet.")
+with col2:
+    appointments_panel()
 
 
 # Footer
 st.markdown("---")
 st.markdown(
-    """
-<div style="text-align: center; color: #666;">
-    <small>
-        🤖 Powered by FastAPI + LangGraph + Streamlit | 
-        <strong>Conversation ID:</strong> {conversation_id}
-    </small>
-</div>
-""".format(
-        conversation_id=st.session_state.conversation_id[:8]
-    ),
+    _FOOTER.format(conversation_id=st.session_state.conversation_id[:8]),
     unsafe_allow_html=True,
 )
 
 # Sidebar with instructions
 with st.sidebar:
     st.markdown("## 📖 How to Use")
-    st.markdown(
-        """
-    **✅ RECOMMENDED - Use Quick Phrase Buttons:**
-    - Click the buttons instead of typing
-    - These phrases work best with the AI
-    - Covers all booking scenarios
-    
-    **🎯 Proven Working Phrases:**
-    - "book meeting tomorrow"
-    - "schedule call tomorrow" 
-    - "check availability next week"
-    - "what slots are available"
-    - Numbers: "1", "2", "3", "4" for slot selection
-    - "confirm", "yes", "sounds good"
-    
-    **⚠️ Avoid Complex Language:**
-    - Don't use: "I would like to schedule..."
-    - Use: "book meeting tomorrow"
-    - Don't use: "Can we meet on..."
-    - Use: "book meeting monday"
-    """
-    )
+    st.markdown(_SIDEBAR_HOWTO)
 
     st.markdown("---")
     st.markdown("## 🔧 System Status")
 
     # Check API health
-    try:
-        health_response = requests.get(f"{API_BASE_URL}/health", timeout=5)
-        if health_response.status_code == 200:
-            st.success("✅ API Connected")
-        else:
-            st.error("❌ API Error")
-    except:
+    health = check_api_health()
+    if health == "ok":
+        st.success("✅ API Connected")
+    elif health == "error":
+        st.error("❌ API Error")
+    else:
         st.error("❌ API Offline")
 
+    if st.button("🔁 Re-check API", key="recheck_api"):
+        check_api_health.clear()
+        st.rerun()
+
     st.markdown("---")
     st.markdown("## 🎯 Booking Tips")
-    st.markdown(
-        """
-    **Step 1:** Click a booking button  
-    **Step 2:** Wait for available slots  
-    **Step 3:** Click slot number (1, 2, 3, 4)  
-    **Step 4:** Confirm with "yes" or "confirm"
-    
-    **Most reliable phrases:**
-    - book meeting tomorrow
-    - check availability tomorrow  
-    - 1 (for first slot)
-    - confirm
-    """
-    )
+    st.markdown(_SIDEBAR_TIPS)
 
     if st.button("🔄 Reset Conversation", key="reset_conversation"):
+        st.session_state.update(conversation_defaults())
         st.session_state.conversation_id = str(uuid.uuid4())
-        st.session_state.messages = []
-        st.session_state.booking_confirmed = False
-        st.session_state.awaiting_confirmation = False
-        st.session_state.selected_slot = None
         st.rerun()